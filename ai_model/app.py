@@ -16,6 +16,11 @@ import csv
 import uuid
 import requests
 from dotenv import load_dotenv
+from quantization import load_cached_components, quantize_pipeline
+from profiling import NULL_SESSION, RequestProfiler
+from write_behind import WriteBehindBuffer
+from event_styles import EventStyleTable
+import atexit
 
 # Load environment variables
 load_dotenv()
@@ -84,20 +89,34 @@ device = "cuda" if torch.cuda.is_available() else "cpu"
 torch_dtype = torch.float16 if device == "cuda" else torch.float32
 logger.info(f"Using device: {device} with dtype: {torch_dtype}")
 
+# Opt-in int8 dynamic quantization of the UNet and text encoder (CPU only)
+QUANTIZE_INT8 = os.getenv('QUANTIZE_INT8', 'false').lower() in ('1', 'true', 'yes')
+QUANTIZED_CACHE_DIR = os.getenv('QUANTIZED_CACHE_DIR', os.path.join(APP_ROOT, 'quantized_cache'))
+quantized = False
+
 try:
     # Load the Stable Diffusion model
     logger.info("Loading Stable Diffusion model...")
     model_id = "CompVis/stable-diffusion-v1-4"
+    # Reuse cached int8 components so their float32 weights are never loaded
+    cached_components = {}
+    if device == "cpu" and QUANTIZE_INT8:
+        cached_components = load_cached_components(model_id, QUANTIZED_CACHE_DIR)
     pipe = StableDiffusionImg2ImgPipeline.from_pretrained(
         model_id,
         torch_dtype=torch_dtype,
-        safety_checker=None
+        safety_checker=None,
+        **cached_components
     )
     pipe = pipe.to(device)
     
     if device == "cuda":
         pipe.enable_attention_slicing()
         pipe.enable_sequential_cpu_offload()
+    elif QUANTIZE_INT8:
+        logger.info("Applying int8 dynamic quantization to UNet and text encoder...")
+        pipe = quantize_pipeline(pipe, model_id, QUANTIZED_CACHE_DIR)
+        quantized = True
     
     logger.info("Model loaded successfully")
 except Exception as e:
@@ -169,6 +188,37 @@ def get_latest_image_for_request(request_id):
         logger.error(f"Error reading CSV: {str(e)}")
         return None
 
+# Per-request profiling (operator-only, disabled unless configured)
+request_profiler = RequestProfiler(
+    output_dir=os.getenv('PROFILE_DIR', os.path.join(APP_ROOT, 'profiles')),
+    max_traces=int(os.getenv('PROFILE_MAX_TRACES', 20)),
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0.0)),
+    admin_token=os.getenv('PROFILING_ADMIN_TOKEN')
+)
+
+# Write-behind reporting of generated images to the database service
+DATABASE_SERVICE_URL = os.getenv('DATABASE_SERVICE_URL')
+image_metadata_buffer = None
+event_style_table = None
+if DATABASE_SERVICE_URL:
+    image_metadata_buffer = WriteBehindBuffer(
+        endpoint=f"{DATABASE_SERVICE_URL.rstrip('/')}/image-metadata/bulk",
+        spool_path=os.getenv('IMAGE_METADATA_SPOOL', os.path.join(APP_ROOT, 'spool', 'image_metadata.jsonl')),
+        key='images',
+        batch_size=int(os.getenv('IMAGE_METADATA_BATCH_SIZE', 50)),
+        flush_interval=float(os.getenv('IMAGE_METADATA_FLUSH_INTERVAL', 5.0))
+    )
+    image_metadata_buffer.start()
+    atexit.register(image_metadata_buffer.stop)
+
+    # Event styles kept hot from the database service's change feed
+    event_style_table = EventStyleTable(
+        DATABASE_SERVICE_URL,
+        poll_interval=float(os.getenv('EVENT_STYLES_POLL_INTERVAL', 5.0))
+    )
+    event_style_table.start()
+    atexit.register(event_style_table.stop)
+
 # Mailgun configuration
 MAILGUN_API_KEY = os.getenv('MAILGUN_API_KEY')
 MAILGUN_DOMAIN = os.getenv('MAILGUN_DOMAIN')
@@ -191,7 +241,8 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "device": device,
-        "torch_dtype": str(torch_dtype)
+        "torch_dtype": str(torch_dtype),
+        "quantized": quantized
     }), 200
 
 # Serve generated images
@@ -207,30 +258,47 @@ def serve_image(filename):
 @app.route('/api/generate', methods=['POST'])
 def generate():
     """Handle image generation requests."""
+    # Generate a unique request ID
+    request_id = str(uuid.uuid4())[:8]
+    # Profiling must never fail the request: fall back to no profiling on any error
+    session = NULL_SESSION
+    try:
+        session = request_profiler.session_for(request_id, request.headers, pipe)
+        session.start()
+    except Exception as e:
+        logger.error(f"Failed to start profiling for request_id {request_id}: {str(e)}")
+        session.finish()
+        session = NULL_SESSION
     try:
-        logger.info("Received generate request")
+        logger.info(f"Received generate request, request_id: {request_id}")
         logger.debug(f"Request Headers: {request.headers}")
-        logger.debug(f"Files in request: {request.files}")
-        logger.debug(f"Form data in request: {request.form}")
 
-        if 'image' not in request.files:
-            logger.error("No image file in request")
-            return jsonify({"error": "No image file in request"}), 400
+        with session.stage('upload_parse'):
+            logger.debug(f"Files in request: {request.files}")
+            logger.debug(f"Form data in request: {request.form}")
 
-        # Generate a unique request ID
-        request_id = str(uuid.uuid4())[:8]
-        logger.info(f"Generated request_id: {request_id}")
-        
-        # Get the image file
-        image_file = request.files['image']
-        logger.info(f"Processing image file: {image_file.filename}")
+            if 'image' not in request.files:
+                logger.error("No image file in request")
+                return jsonify({"error": "No image file in request"}), 400
+
+            # Get the image file
+            image_file = request.files['image']
+            logger.info(f"Processing image file: {image_file.filename}")
 
-        # Read and preprocess the image
-        image = Image.open(image_file).convert('RGB')
-        logger.info(f"Image loaded successfully: size={image.size}, mode={image.mode}")
+            # Read and preprocess the image
+            image = Image.open(image_file).convert('RGB')
+            logger.info(f"Image loaded successfully: size={image.size}, mode={image.mode}")
 
         # Get generation parameters
         prompt = request.form.get('prompt', "A photo of a person")
+        event_id = request.form.get('event_id')
+        style_id = request.form.get('style_id')
+        if event_style_table is not None and event_id and style_id:
+            style_prompt = event_style_table.prompt_for(event_id, style_id)
+            if style_prompt:
+                prompt = style_prompt
+            else:
+                logger.warning(f"Unknown style {style_id} for event {event_id}, using request prompt")
         strength = float(request.form.get('strength', 0.75))
         guidance_scale = float(request.form.get('guidance_scale', 7.5))
         num_inference_steps = int(request.form.get('num_inference_steps', 50))
@@ -238,13 +306,14 @@ def generate():
         logger.info(f"Starting image generation with prompt: {prompt}")
 
         # Generate the image
-        output = pipe(
-            prompt=prompt,
-            image=image,
-            strength=strength,
-            guidance_scale=guidance_scale,
-            num_inference_steps=num_inference_steps
-        ).images[0]
+        with session.stage('diffusion'):
+            output = pipe(
+                prompt=prompt,
+                image=image,
+                strength=strength,
+                guidance_scale=guidance_scale,
+                num_inference_steps=num_inference_steps
+            ).images[0]
 
         logger.info("Image generation completed successfully")
 
@@ -254,17 +323,33 @@ def generate():
         output_path = os.path.join(GENERATED_IMAGES_DIR, filename)
         
         # Save the image
-        output.save(output_path)
+        with session.stage('png_save'):
+            output.save(output_path)
         logger.info(f"Saved generated image to {output_path}")
 
         # Track the generated image in CSV - with better error handling
-        if not track_generated_image(filename, request_id):
-            logger.warning("Failed to track image in CSV, but continuing with response")
+        with session.stage('csv_track'):
+            if not track_generated_image(filename, request_id):
+                logger.warning("Failed to track image in CSV, but continuing with response")
+
+        # Report the generated image to the database service in the background
+        if image_metadata_buffer is not None:
+            try:
+                image_metadata_buffer.add({
+                    "original_image_path": image_file.filename,
+                    "transformed_image_path": filename,
+                    "transformation_style": style_id or request.form.get('style', prompt),
+                    "request_id": request_id,
+                    "created_at": datetime.utcnow().isoformat()
+                })
+            except Exception as e:
+                logger.warning(f"Failed to queue image metadata, but continuing with response: {str(e)}")
 
         # Convert the image to base64 for immediate response
-        buffered = io.BytesIO()
-        output.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        with session.stage('png_encode'):
+            buffered = io.BytesIO()
+            output.save(buffered, format="PNG")
+            img_str = base64.b64encode(buffered.getvalue()).decode()
 
         response_data = {
             "success": True,
@@ -278,6 +363,51 @@ def generate():
     except Exception as e:
         logger.error(f"Error generating image: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        session.finish()
+
+def require_admin():
+    """Return an error response unless the request carries the admin token."""
+    if not request_profiler.admin_token:
+        return jsonify({"error": "Profiling admin access not configured"}), 403
+    if not request_profiler.is_admin(request.headers):
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+# Profiling admin endpoints
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_settings():
+    """View or update the profiling sample rate and trace retention."""
+    error = require_admin()
+    if error:
+        return error
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        try:
+            request_profiler.configure(
+                sample_rate=data.get('sample_rate'),
+                max_traces=data.get('max_traces')
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        logger.info(f"Profiling settings updated: {request_profiler.settings()}")
+    return jsonify(request_profiler.settings())
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List stored request profiles, newest first."""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify({"profiles": request_profiler.list_traces()})
+
+@app.route('/admin/profiles/<request_id>/<filename>', methods=['GET'])
+def download_profile(request_id, filename):
+    """Download one file of a stored request profile."""
+    error = require_admin()
+    if error:
+        return error
+    return send_from_directory(request_profiler.output_dir, f"{request_id}/{filename}", as_attachment=True)
 
 # Status check endpoint
 @app.route('/status/<request_id>', methods=['GET'])
@@ -0,0 +1,192 @@
+# ai_model/benchmark_quantization.py
+"""Compare float32 and int8-quantized CPU inference for the img2img pipeline.
+
+Each mode runs in its own subprocess so resident memory is measured in
+isolation. The int8 worker loads the quantized components from the on-disk
+cache (populated first if needed), the same way the service starts, so its
+float32 weights are never resident. The report records steady-state seconds
+per UNet step (the first step is excluded since it also covers preprocessing
+and the CLIP/VAE encodes, which are reported as the time to the first step),
+current RSS after loading and after generating, and the similarity of the
+int8 output to the float32 output for the same seed.
+
+Usage:
+    python benchmark_quantization.py --steps 20 --output quantization_report.json
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_ID = "CompVis/stable-diffusion-v1-4"
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, after collecting garbage."""
+    gc.collect()
+    with open('/proc/self/statm') as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def run_worker(args):
+    """Load the pipeline in the requested mode, generate once and print metrics as JSON."""
+    import torch
+    from diffusers import StableDiffusionImg2ImgPipeline
+    from quantization import load_cached_components, quantize_pipeline
+
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+
+    load_start = time.perf_counter()
+    cached_components = {}
+    if args.worker == "int8":
+        cached_components = load_cached_components(MODEL_ID, args.cache_dir)
+    pipe = StableDiffusionImg2ImgPipeline.from_pretrained(
+        MODEL_ID,
+        torch_dtype=torch.float32,
+        safety_checker=None,
+        **cached_components
+    ).to("cpu")
+    if args.worker == "int8":
+        pipe = quantize_pipeline(pipe, MODEL_ID, args.cache_dir)
+    load_seconds = time.perf_counter() - load_start
+    if args.prepare_only:
+        return
+    rss_after_load = current_rss_mb()
+
+    image = Image.open(args.image).convert('RGB').resize((512, 512))
+    step_times = []
+
+    def on_step_end(pipeline, step, timestep, callback_kwargs):
+        step_times.append(time.perf_counter())
+        return callback_kwargs
+
+    generator = torch.Generator("cpu").manual_seed(args.seed)
+    start = time.perf_counter()
+    output = pipe(
+        prompt=args.prompt,
+        image=image,
+        strength=args.strength,
+        guidance_scale=7.5,
+        num_inference_steps=args.steps,
+        generator=generator,
+        callback_on_step_end=on_step_end
+    ).images[0]
+    total_seconds = time.perf_counter() - start
+    output.save(args.out)
+
+    # The first step also covers preprocessing, CLIP and VAE encoding; keep it out of the UNet step time
+    step_deltas = np.diff(step_times)
+    seconds_to_first_step = step_times[0] - start if step_times else None
+    print(json.dumps({
+        "mode": args.worker,
+        "load_seconds": round(load_seconds, 2),
+        "total_seconds": round(total_seconds, 2),
+        "unet_steps": len(step_times),
+        "seconds_to_first_step": round(seconds_to_first_step, 3) if seconds_to_first_step is not None else None,
+        "seconds_per_step": round(float(np.mean(step_deltas)), 3) if len(step_deltas) else None,
+        "rss_after_load_mb": round(rss_after_load, 1),
+        "rss_after_generate_mb": round(current_rss_mb(), 1)
+    }))
+
+
+def image_similarity(path_a, path_b):
+    """Return PSNR and a global (single-window) SSIM between two images."""
+    a = np.asarray(Image.open(path_a).convert('L'), dtype=np.float64)
+    b = np.asarray(Image.open(path_b).convert('L'), dtype=np.float64)
+
+    mse = np.mean((a - b) ** 2)
+    psnr = float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_a, mu_b = a.mean(), b.mean()
+    cov = np.mean((a - mu_a) * (b - mu_b))
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / \
+        ((mu_a ** 2 + mu_b ** 2 + c1) * (a.var() + b.var() + c2))
+
+    return {"psnr_db": round(float(psnr), 2), "ssim": round(float(ssim), 4)}
+
+
+def run_mode(mode, args, out_path, prepare_only=False):
+    """Run one benchmark mode in a fresh interpreter and return its metrics."""
+    cmd = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", mode,
+        "--out", out_path,
+        "--image", args.image,
+        "--prompt", args.prompt,
+        "--steps", str(args.steps),
+        "--strength", str(args.strength),
+        "--seed", str(args.seed),
+        "--cache-dir", args.cache_dir,
+        "--threads", str(args.threads)
+    ] + (["--prepare-only"] if prepare_only else [])
+    print(f"{'Preparing' if prepare_only else 'Running'} {mode} benchmark...")
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=SCRIPT_DIR)
+    if result.returncode != 0:
+        print(result.stderr)
+        raise RuntimeError(f"{mode} benchmark failed")
+    if prepare_only:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default=os.path.join(SCRIPT_DIR, "testimage1.png"))
+    parser.add_argument("--prompt", default="A futuristic portrait")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--strength", type=float, default=0.75)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--cache-dir", default=os.getenv(
+        'QUANTIZED_CACHE_DIR', os.path.join(SCRIPT_DIR, 'quantized_cache')))
+    parser.add_argument("--output", default="quantization_report.json")
+    parser.add_argument("--worker", choices=["float32", "int8"], help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    parser.add_argument("--prepare-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Quantize and cache in a throwaway process so the measured int8 run starts from the cache
+        run_mode("int8", args, os.path.join(tmp_dir, "prepare.png"), prepare_only=True)
+        outputs = {mode: os.path.join(tmp_dir, f"{mode}.png") for mode in ("float32", "int8")}
+        results = {mode: run_mode(mode, args, path) for mode, path in outputs.items()}
+        similarity = image_similarity(outputs["float32"], outputs["int8"])
+
+    baseline, quantized = results["float32"], results["int8"]
+    report = {
+        "model_id": MODEL_ID,
+        "steps": args.steps,
+        "strength": args.strength,
+        "seed": args.seed,
+        "float32": baseline,
+        "int8": quantized,
+        "speedup": round(baseline["seconds_per_step"] / quantized["seconds_per_step"], 2),
+        "rss_reduction_after_load_mb": round(baseline["rss_after_load_mb"] - quantized["rss_after_load_mb"], 1),
+        "rss_reduction_after_generate_mb": round(
+            baseline["rss_after_generate_mb"] - quantized["rss_after_generate_mb"], 1),
+        "similarity_vs_float32": similarity
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# ai_model/event_styles.py
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class EventStyleTable:
+    """Keeps the transformation prompts of current and upcoming events in memory.
+
+    A background thread polls the database service's in-memory change feed
+    and refetches only the event configs that changed, using their ETags so
+    unchanged configs cost a 304. After a service restart (new epoch) or a
+    gap in the feed, all events that have not ended are reloaded. Styles
+    are only served while their event is running, and ended events are
+    dropped on each poll.
+    """
+
+    def __init__(self, service_url, poll_interval=5.0, timeout=5):
+        self.service_url = service_url.rstrip('/')
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._events = {}
+        self._etags = {}
+        self._epoch = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run, name='event-styles', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Event style table following {self.service_url}/event-configs/changes")
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=self.timeout)
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def _parse_date(value):
+        """Parse a date as serialized by the database service (HTTP date or ISO 8601)."""
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            parsed = datetime.fromisoformat(value)
+        # The database service stores naive UTC datetimes
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    @classmethod
+    def _event_entry(cls, event):
+        return {
+            'start_date': cls._parse_date(event['start_date']),
+            'end_date': cls._parse_date(event['end_date']),
+            'styles': {
+                style['id']: style['prompt']
+                for style in event.get('transformation_styles', [])
+                if style.get('is_active', True)
+            }
+        }
+
+    def _running_event(self, event_id):
+        event = self._events.get(event_id)
+        if event and event['start_date'] <= self._now() <= event['end_date']:
+            return event
+        return None
+
+    def prompt_for(self, event_id, style_id):
+        """Return the prompt of an active style of a running event, or None."""
+        with self._lock:
+            event = self._running_event(event_id)
+            return event['styles'].get(style_id) if event else None
+
+    def styles_for(self, event_id):
+        with self._lock:
+            event = self._running_event(event_id)
+            return dict(event['styles']) if event else {}
+
+    def _drop_ended(self):
+        """Forget events whose end_date has passed."""
+        now = self._now()
+        with self._lock:
+            ended = [event_id for event_id, event in self._events.items() if event['end_date'] < now]
+            for event_id in ended:
+                del self._events[event_id]
+                self._etags.pop(event_id, None)
+        if ended:
+            logger.info(f"Dropped styles for {len(ended)} ended events")
+
+    def _reload_all(self):
+        """Replace the table with every event that has not ended."""
+        response = self._session.get(f"{self.service_url}/event-configs", timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        events = {event['id']: self._event_entry(event) for event in data['events']}
+        with self._lock:
+            self._events = events
+            self._etags = {}
+            self._epoch = data['epoch']
+            self._version = data['version']
+        logger.info(f"Loaded styles for {len(events)} current and upcoming events (version {self._version})")
+
+    def _refresh_event(self, event_id):
+        """Refetch one event config, skipping the body if its ETag is unchanged."""
+        headers = {}
+        if event_id in self._etags:
+            headers['If-None-Match'] = self._etags[event_id]
+        response = self._session.get(f"{self.service_url}/event-config/{event_id}", headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return
+        if response.status_code == 404:
+            with self._lock:
+                self._events.pop(event_id, None)
+                self._etags.pop(event_id, None)
+            return
+        response.raise_for_status()
+        event = self._event_entry(response.json())
+        with self._lock:
+            self._events[event_id] = event
+            etag = response.headers.get('ETag')
+            if etag:
+                self._etags[event_id] = etag
+
+    def poll(self):
+        """Apply any changes published since the last poll."""
+        response = self._session.get(
+            f"{self.service_url}/event-configs/changes",
+            params={'epoch': self._epoch or '', 'since': self._version},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        feed = response.json()
+        self._drop_ended()
+
+        if feed['reset']:
+            self._reload_all()
+            return
+
+        for event_id in feed['changed']:
+            self._refresh_event(event_id)
+        self._version = feed['version']
+        if feed['changed']:
+            logger.info(f"Refreshed styles for {len(feed['changed'])} events (version {self._version})")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except (requests.RequestException, KeyError, ValueError) as e:
+                logger.warning(f"Failed to refresh event styles: {str(e)}")
+            self._stopped.wait(self.poll_interval)
@@ -0,0 +1,240 @@
+# ai_model/profiling.py
+import contextlib
+import hmac
+import json
+import logging
+import os
+import random
+import shutil
+import threading
+import time
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Pipeline submodules timed separately inside the diffusion call
+PIPELINE_MODULES = {
+    'text_encoder': lambda pipe: pipe.text_encoder,
+    'vae_encode': lambda pipe: pipe.vae.encoder,
+    'unet': lambda pipe: pipe.unet,
+    'vae_decode': lambda pipe: pipe.vae.decoder,
+}
+
+
+class NullSession:
+    """Stand-in used for requests that are not profiled; every hook is a no-op."""
+
+    profiled = False
+
+    def start(self):
+        pass
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def finish(self):
+        pass
+
+
+NULL_SESSION = NullSession()
+
+
+class ProfileSession:
+    """Profiles a single request with torch.profiler and a Python sampling profiler."""
+
+    profiled = True
+
+    def __init__(self, profiler, request_id, pipe):
+        self.profiler = profiler
+        self.request_id = request_id
+        self.pipe = pipe
+        self.output_dir = os.path.join(profiler.output_dir, request_id)
+        self.stages = {}
+        self.module_seconds = {}
+        self._hooks = []
+        self._torch_profiler = None
+        self._sampler = None
+        self._started_at = None
+        self._thread_id = None
+
+    def start(self):
+        """Start both profilers and attach timing hooks to the pipeline modules."""
+        self._thread_id = threading.get_ident()
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._torch_profiler = torch.profiler.profile(activities=activities)
+        self._torch_profiler.start()
+
+        try:
+            from pyinstrument import Profiler
+            self._sampler = Profiler(interval=0.005, async_mode='disabled')
+            self._sampler.start()
+        except ImportError:
+            logger.warning("pyinstrument not installed; skipping Python sampling profile")
+
+        for name, get_module in PIPELINE_MODULES.items():
+            self._attach_hooks(name, get_module(self.pipe))
+
+        self._started_at = time.perf_counter()
+        logger.info(f"Profiling request_id: {self.request_id}")
+
+    def _attach_hooks(self, name, module):
+        """Wrap every forward of ``module`` in a labelled record_function.
+
+        The modules are shared by all request threads, so the hooks ignore
+        forwards from any thread other than the profiled request's.
+        """
+        active = []
+
+        def pre_hook(mod, args):
+            if threading.get_ident() != self._thread_id:
+                return
+            record = torch.profiler.record_function(name)
+            record.__enter__()
+            active.append((record, time.perf_counter()))
+
+        def post_hook(mod, args, output):
+            if threading.get_ident() != self._thread_id or not active:
+                return
+            record, started = active.pop()
+            record.__exit__(None, None, None)
+            self.module_seconds[name] = self.module_seconds.get(name, 0.0) + time.perf_counter() - started
+
+        self._hooks.append(module.register_forward_pre_hook(pre_hook))
+        self._hooks.append(module.register_forward_hook(post_hook))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a named stage of the request and label it in the torch trace."""
+        started = time.perf_counter()
+        with torch.profiler.record_function(name):
+            try:
+                yield
+            finally:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def finish(self):
+        """Stop profiling, write the traces and release the profiler for the next request."""
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+        try:
+            if self._started_at is None:
+                # start() failed part way; just stop whatever did start
+                if self._torch_profiler is not None:
+                    self._torch_profiler.stop()
+                if self._sampler is not None and self._sampler.is_running:
+                    self._sampler.stop()
+                return
+
+            total_seconds = time.perf_counter() - self._started_at
+            self._torch_profiler.stop()
+            if self._sampler is not None:
+                self._sampler.stop()
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._torch_profiler.export_chrome_trace(os.path.join(self.output_dir, 'torch_trace.json'))
+            with open(os.path.join(self.output_dir, 'torch_ops.txt'), 'w') as f:
+                f.write(self._torch_profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=40))
+            if self._sampler is not None:
+                with open(os.path.join(self.output_dir, 'python_profile.html'), 'w') as f:
+                    f.write(self._sampler.output_html())
+
+            summary = {
+                'request_id': self.request_id,
+                'total_seconds': round(total_seconds, 4),
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'modules': {name: round(seconds, 4) for name, seconds in self.module_seconds.items()},
+            }
+            with open(os.path.join(self.output_dir, 'summary.json'), 'w') as f:
+                json.dump(summary, f, indent=2)
+
+            logger.info(f"Wrote profile for request_id {self.request_id} to {self.output_dir}")
+            self.profiler.prune()
+        except Exception as e:
+            logger.error(f"Error writing profile for request_id {self.request_id}: {str(e)}")
+        finally:
+            self.profiler.release()
+
+
+class RequestProfiler:
+    """Decides which requests are profiled and manages the bounded trace directory.
+
+    Profiling is operator-only: a request is profiled when it carries the
+    admin token together with ``X-Profile: 1``, or when it is picked by the
+    sample rate an operator set. Only one request is profiled at a time.
+    """
+
+    def __init__(self, output_dir, max_traces=20, sample_rate=0.0, admin_token=None):
+        self.output_dir = output_dir
+        self.max_traces = max_traces
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self._lock = threading.Lock()
+
+    def is_admin(self, headers):
+        """Check the request headers for a valid admin token."""
+        token = headers.get('X-Admin-Token')
+        if not (self.admin_token and token):
+            return False
+        # compare_digest rejects non-ASCII str, and header values may hold any latin-1 text
+        return hmac.compare_digest(token.encode('utf-8'), self.admin_token.encode('utf-8'))
+
+    def session_for(self, request_id, headers, pipe):
+        """Return a ProfileSession if this request should be profiled, else NULL_SESSION."""
+        if not self.admin_token and not self.sample_rate:
+            return NULL_SESSION
+
+        forced = headers.get('X-Profile') == '1' and self.is_admin(headers)
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not (forced or sampled):
+            return NULL_SESSION
+
+        if not self._lock.acquire(blocking=False):
+            logger.info(f"Profiler busy, not profiling request_id: {request_id}")
+            return NULL_SESSION
+        return ProfileSession(self, request_id, pipe)
+
+    def release(self):
+        self._lock.release()
+
+    def configure(self, sample_rate=None, max_traces=None):
+        """Update the sampling settings at runtime."""
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if max_traces is not None:
+            self.max_traces = max(int(max_traces), 1)
+            self.prune()
+
+    def settings(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'max_traces': self.max_traces,
+            'output_dir': self.output_dir,
+        }
+
+    def list_traces(self):
+        """List stored profiles, newest first."""
+        if not os.path.isdir(self.output_dir):
+            return []
+
+        traces = []
+        for request_id in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, request_id)
+            if not os.path.isdir(path):
+                continue
+            traces.append({
+                'request_id': request_id,
+                'created_at': os.path.getmtime(path),
+                'files': sorted(os.listdir(path)),
+            })
+        return sorted(traces, key=lambda trace: trace['created_at'], reverse=True)
+
+    def prune(self):
+        """Delete the oldest profiles beyond ``max_traces``."""
+        for trace in self.list_traces()[self.max_traces:]:
+            shutil.rmtree(os.path.join(self.output_dir, trace['request_id']), ignore_errors=True)
+            logger.info(f"Pruned profile for request_id: {trace['request_id']}")
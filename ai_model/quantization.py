@@ -0,0 +1,126 @@
+# ai_model/quantization.py
+import logging
+import os
+import re
+from importlib.metadata import version
+
+import torch
+from torch import nn
+from torch.ao.nn.quantized import dynamic as nnqd
+from torch.ao.quantization import default_dynamic_qconfig
+
+logger = logging.getLogger(__name__)
+
+# Components of StableDiffusionImg2ImgPipeline that get int8 linear layers
+QUANTIZED_COMPONENTS = ('unet', 'text_encoder')
+
+
+class DynamicQuantizedLinear(nn.Module):
+    """Int8 dynamic linear layer that accepts the extra args diffusers passes.
+
+    diffusers' LoRA-compatible linear layers are called as ``layer(x, scale)``,
+    which the stock quantized module does not accept. The scale only matters
+    when LoRA weights are attached, which this pipeline never does.
+    """
+
+    def __init__(self, quantized):
+        super().__init__()
+        self.quantized = quantized
+
+    def forward(self, hidden_states, *args, **kwargs):
+        return self.quantized(hidden_states)
+
+
+def _to_dynamic_int8(linear):
+    """Convert a (possibly subclassed) nn.Linear into a dynamic int8 module."""
+    plain = nn.Linear(linear.in_features, linear.out_features, bias=linear.bias is not None)
+    plain.weight = linear.weight
+    plain.bias = linear.bias
+    plain.qconfig = default_dynamic_qconfig
+    quantized = nnqd.Linear.from_float(plain)
+    if type(linear) is nn.Linear:
+        return quantized
+    return DynamicQuantizedLinear(quantized)
+
+
+def quantize_linear_layers(module):
+    """Replace every nn.Linear in ``module`` with a dynamic int8 equivalent, in place."""
+    count = 0
+    for name, child in list(module.named_children()):
+        if isinstance(child, nn.Linear):
+            setattr(module, name, _to_dynamic_int8(child))
+            count += 1
+        else:
+            count += quantize_linear_layers(child)
+    return count
+
+
+def _cache_path(cache_dir, model_id, component):
+    """Build the on-disk path of a cached quantized component.
+
+    Whole module objects are pickled, so the key includes every library
+    whose classes they contain; an upgrade of any of them misses the cache.
+    """
+    safe_model_id = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id)
+    versions = '-'.join(
+        f"{library}{version(library)}".replace('+', '_')
+        for library in ('torch', 'diffusers', 'transformers')
+    )
+    return os.path.join(cache_dir, f"{safe_model_id}-{component}-int8-{versions}.pt")
+
+
+def load_cached_components(model_id, cache_dir):
+    """Load previously quantized components from ``cache_dir``.
+
+    Returns a dict suitable for passing as keyword arguments to
+    ``from_pretrained`` so the float32 versions are never loaded.
+    Missing or unreadable cache files are skipped.
+    """
+    components = {}
+    for component in QUANTIZED_COMPONENTS:
+        path = _cache_path(cache_dir, model_id, component)
+        if not os.path.exists(path):
+            continue
+        try:
+            module = torch.load(path, map_location='cpu', weights_only=False)
+            module.eval()
+            components[component] = module
+            logger.info(f"Loaded quantized {component} from cache: {path}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable quantized cache {path}: {str(e)}")
+    return components
+
+
+def quantize_pipeline(pipe, model_id, cache_dir):
+    """Apply dynamic int8 quantization to the UNet and text encoder of ``pipe``.
+
+    Components that are already quantized (e.g. loaded with
+    ``load_cached_components``) are left alone. Newly quantized components are
+    pickled to ``cache_dir`` so later starts can skip re-quantizing. Only valid
+    for CPU inference.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    for component in QUANTIZED_COMPONENTS:
+        module = getattr(pipe, component)
+        if getattr(module, 'int8_quantized', False):
+            continue
+
+        module = module.to('cpu')
+        count = quantize_linear_layers(module)
+        module.int8_quantized = True
+        module.eval()
+        logger.info(f"Quantized {count} linear layers in {component} to int8")
+
+        path = _cache_path(cache_dir, model_id, component)
+        try:
+            tmp_path = f"{path}.tmp"
+            torch.save(module, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info(f"Cached quantized {component} at: {path}")
+        except Exception as e:
+            logger.warning(f"Failed to cache quantized {component}: {str(e)}")
+
+        setattr(pipe, component, module)
+
+    return pipe
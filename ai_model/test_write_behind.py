@@ -0,0 +1,186 @@
+import json
+
+import pytest
+import requests
+
+from write_behind import WriteBehindBuffer
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.text = str(self._body) if isinstance(self._body, Exception) else json.dumps(self._body)
+
+    def json(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+
+class FakeSession:
+    """Records posted batches and answers with queued responses or exceptions."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.batches = []
+
+    def post(self, url, json=None, timeout=None):
+        self.batches.append(json['images'])
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def accepted(batch_size):
+    return FakeResponse(201, {'results': [{'index': i, 'status': 'inserted'} for i in range(batch_size)]})
+
+
+def make_buffer(tmp_path, session, batch_size=2):
+    buffer = WriteBehindBuffer(
+        endpoint='http://database-service/image-metadata/bulk',
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        key='images',
+        batch_size=batch_size
+    )
+    buffer._session = session
+    return buffer
+
+
+def spooled(tmp_path):
+    with open(tmp_path / 'spool.jsonl') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_records_are_spooled_before_being_sent(tmp_path):
+    buffer = make_buffer(tmp_path, FakeSession())
+    buffer.add({'request_id': 'a'})
+
+    assert spooled(tmp_path) == [{'request_id': 'a'}]
+    assert buffer.pending_count() == 1
+
+
+def test_flush_sends_in_batches_and_clears_spool(tmp_path):
+    session = FakeSession(accepted(2), accepted(1))
+    buffer = make_buffer(tmp_path, session)
+    for request_id in 'abc':
+        buffer.add({'request_id': request_id})
+
+    buffer.flush()
+
+    assert session.batches == [[{'request_id': 'a'}, {'request_id': 'b'}], [{'request_id': 'c'}]]
+    assert buffer.pending_count() == 0
+    assert spooled(tmp_path) == []
+
+
+@pytest.mark.parametrize('failure', [
+    requests.ConnectionError('database service down'),
+    requests.Timeout('no response'),
+    FakeResponse(503, {'error': 'unavailable'}),
+])
+def test_failed_flush_keeps_records_spooled(tmp_path, failure):
+    buffer = make_buffer(tmp_path, FakeSession(failure))
+    buffer.add({'request_id': 'a'})
+
+    buffer.flush()
+
+    assert buffer.pending_count() == 1
+    assert spooled(tmp_path) == [{'request_id': 'a'}]
+
+
+@pytest.mark.parametrize('body', [
+    ValueError('Expecting value: line 1 column 1 (char 0)'),
+    [{'index': 0, 'status': 'inserted'}],
+    {'error': 'no results'},
+])
+def test_unparseable_success_response_keeps_records_spooled(tmp_path, body):
+    buffer = make_buffer(tmp_path, FakeSession(FakeResponse(200, body)))
+    buffer.add({'request_id': 'a'})
+
+    buffer.flush()
+
+    assert buffer.pending_count() == 1
+    assert spooled(tmp_path) == [{'request_id': 'a'}]
+
+
+def test_failed_spool_rewrite_keeps_records_pending(tmp_path, monkeypatch):
+    buffer = make_buffer(tmp_path, FakeSession(accepted(1)))
+    buffer.add({'request_id': 'a'})
+
+    def disk_full(records):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(buffer, '_rewrite_spool', disk_full)
+    with pytest.raises(OSError):
+        buffer.flush()
+
+    assert buffer.pending_count() == 1
+    assert spooled(tmp_path) == [{'request_id': 'a'}]
+
+
+def test_background_thread_survives_flush_errors(tmp_path, monkeypatch):
+    buffer = make_buffer(tmp_path, FakeSession())
+    buffer.flush_interval = 0.01
+    calls = []
+
+    def failing_flush():
+        calls.append(1)
+        if len(calls) >= 3:
+            buffer._stopped.set()
+        raise OSError('spool unavailable')
+
+    monkeypatch.setattr(buffer, 'flush', failing_flush)
+    buffer._run()
+
+    assert len(calls) == 3
+
+
+def test_unsent_records_are_resent_after_restart(tmp_path):
+    first_run = make_buffer(tmp_path, FakeSession(requests.Timeout('no response')))
+    first_run.add({'request_id': 'a'})
+    first_run.add({'request_id': 'b'})
+    first_run.flush()
+
+    session = FakeSession(accepted(2))
+    second_run = make_buffer(tmp_path, session)
+    assert second_run.pending_count() == 2
+
+    second_run.flush()
+
+    assert session.batches == [[{'request_id': 'a'}, {'request_id': 'b'}]]
+    assert spooled(tmp_path) == []
+
+
+def test_corrupt_spool_lines_are_skipped_on_recovery(tmp_path):
+    (tmp_path / 'spool.jsonl').write_text('{"request_id": "a"}\n{"request_id": \n\n{"request_id": "b"}\n')
+
+    buffer = make_buffer(tmp_path, FakeSession())
+
+    assert buffer.pending_count() == 2
+
+
+def test_rejected_items_and_client_errors_are_dropped(tmp_path):
+    partial = FakeResponse(207, {'results': [
+        {'index': 0, 'status': 'inserted'},
+        {'index': 1, 'status': 'invalid', 'error': 'missing field'},
+    ]})
+    session = FakeSession(partial, FakeResponse(400, {'error': 'bad payload'}))
+    buffer = make_buffer(tmp_path, session)
+    for request_id in 'abc':
+        buffer.add({'request_id': request_id})
+
+    buffer.flush()
+
+    assert len(session.batches) == 2
+    assert buffer.pending_count() == 0
+    assert spooled(tmp_path) == []
+
+
+def test_full_buffer_refuses_new_records(tmp_path):
+    buffer = make_buffer(tmp_path, FakeSession())
+    buffer.max_pending = 1
+
+    assert buffer.add({'request_id': 'a'}) is True
+    assert buffer.add({'request_id': 'b'}) is False
+    assert spooled(tmp_path) == [{'request_id': 'a'}]
@@ -0,0 +1,147 @@
+# ai_model/write_behind.py
+import json
+import logging
+import os
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Durable buffer that ships records to a bulk endpoint in batches.
+
+    Every record is appended to a JSONL spool file before ``add`` returns, so
+    records survive a restart and are re-sent on the next start. A background
+    thread flushes whenever ``batch_size`` records are pending or
+    ``flush_interval`` seconds have passed. Records stay spooled until the
+    endpoint accepts the batch; per-item rejections are logged and dropped
+    since resending them cannot succeed.
+    """
+
+    def __init__(self, endpoint, spool_path, key, batch_size=50, flush_interval=5.0,
+                 max_pending=10000, timeout=10):
+        self.endpoint = endpoint
+        self.spool_path = spool_path
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = self._load_spool()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+
+    def _load_spool(self):
+        """Read records left over from a previous run."""
+        if not os.path.exists(self.spool_path):
+            return []
+
+        records = []
+        with open(self.spool_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping corrupt line in spool file: {self.spool_path}")
+        if records:
+            logger.info(f"Recovered {len(records)} unsent records from {self.spool_path}")
+        return records
+
+    def _rewrite_spool(self, records):
+        """Atomically replace the spool file with ``records``."""
+        tmp_path = f"{self.spool_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.spool_path) or '.', exist_ok=True)
+        self._thread.start()
+        logger.info(f"Write-behind buffer started for {self.endpoint}")
+
+    def add(self, record):
+        """Durably queue a record; returns False if the buffer is full."""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                logger.error(f"Write-behind buffer full ({self.max_pending}), dropping record")
+                return False
+            with open(self.spool_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        return True
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Send pending records in batches until empty or the endpoint fails."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return
+
+                try:
+                    response = self._session.post(self.endpoint, json={self.key: batch}, timeout=self.timeout)
+                except requests.RequestException as e:
+                    logger.warning(f"Write-behind flush failed, will retry: {str(e)}")
+                    return
+
+                if response.status_code in (200, 201, 207):
+                    try:
+                        results = response.json()['results']
+                    except (ValueError, KeyError, TypeError) as e:
+                        # The batch may not have been stored, so keep it and let the retry deduplicate
+                        logger.warning(f"Unexpected write-behind response ({response.status_code}), will retry: {str(e)}")
+                        return
+                    for result in results:
+                        if result.get('status') != 'inserted':
+                            logger.error(f"Dropping record rejected by {self.endpoint}: {result}")
+                elif 400 <= response.status_code < 500:
+                    logger.error(f"Dropping batch of {len(batch)} rejected by {self.endpoint}: {response.text}")
+                else:
+                    logger.warning(f"Write-behind flush failed ({response.status_code}), will retry: {response.text}")
+                    return
+
+                with self._lock:
+                    # Only flush() removes records and it holds _flush_lock, so the batch is still at the head.
+                    # Rewrite the spool first so a failed write leaves memory and disk in step.
+                    remaining = self._pending[len(batch):]
+                    self._rewrite_spool(remaining)
+                    self._pending = remaining
+                logger.info(f"Flushed {len(batch)} records to {self.endpoint}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the thread alive; unsent records stay pending for the next attempt
+                logger.error(f"Write-behind flush error: {str(e)}")
+
+    def stop(self):
+        """Stop the background thread after a final flush attempt."""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=self.timeout)
+        self.flush()
@@ -1,65 +1,199 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
-import boto3
 from botocore.exceptions import ClientError
+from pymongo.errors import PyMongoError
+import hashlib
+import json
+import logging
 import os
+import threading
 
+from cache import ChangeFeed, TTLCache
 from config import (
-    db, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY,
-    AWS_BUCKET_NAME, AWS_REGION
+    db, BULK_INSERT_MAX_ITEMS, MAX_UPLOAD_SIZE_MB, PRESIGNED_URL_EXPIRES,
+    ALLOWED_UPLOAD_CONTENT_TYPES,
+    EVENT_CONFIG_CACHE_TTL, EVENT_CONFIG_CACHE_MAX_SIZE
 )
 from models import EventConfig, UserLead, ImageMetadata
+from repository import (
+    ensure_indexes, find_current_event_configs, find_event_config,
+    insert_event_config, insert_image_metadata, insert_user_lead,
+    insert_user_leads, parse_object_id, serialize_document, update_event_config
+)
+from storage import (
+    MB, abort_multipart_upload, complete_multipart_upload,
+    create_multipart_upload, create_presigned_post, create_presigned_put,
+    make_object_key, object_url, upload_fileobj
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize S3 client
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+# Read-through cache of serialized event configs, invalidated on writes, and
+# the change feed the AI service follows to keep its style table current
+event_config_cache = TTLCache(maxsize=EVENT_CONFIG_CACHE_MAX_SIZE, ttl=EVENT_CONFIG_CACHE_TTL)
+event_config_changes = ChangeFeed()
+
+# Bulk inserts rely on the unique request_id index for idempotent retries,
+# so they are refused until the indexes have been created
+indexes_lock = threading.Lock()
+indexes_ready = False
+
+def require_indexes():
+    """Create the MongoDB indexes once; raises PyMongoError until that succeeds."""
+    global indexes_ready
+    if indexes_ready:
+        return
+    with indexes_lock:
+        if not indexes_ready:
+            ensure_indexes(db)
+            indexes_ready = True
+            logger.info("MongoDB indexes are ready")
+
+# Try at startup; if Mongo is unreachable, the next bulk insert retries
+try:
+    require_indexes()
+except PyMongoError as e:
+    logger.error(f"Failed to ensure MongoDB indexes, will retry before bulk inserts: {str(e)}")
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
     return jsonify({"status": "healthy", "timestamp": datetime.utcnow()})
 
+def event_config_changed(event_id):
+    """Drop a cached event config and publish the change."""
+    event_config_cache.invalidate(event_id)
+    event_config_changes.record(event_id)
+
+def load_event_config(event_id):
+    """Load and serialize an event config with its ETag, or None if missing."""
+    event = find_event_config(db, event_id)
+    if not event:
+        return None
+    body = serialize_document(event)
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+    return {"body": body, "etag": digest}
+
 @app.route('/event-config', methods=['POST'])
 def create_event_config():
     """Create a new event configuration."""
     try:
         data = request.json
         event_config = EventConfig(**data)
-        result = db.event_configs.insert_one(event_config.dict())
-        return jsonify({"message": "Event config created", "id": str(result.inserted_id)}), 201
+        event_id = insert_event_config(db, event_config)
+        event_config_changed(str(event_id))
+        return jsonify({"message": "Event config created", "id": str(event_id)}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/event-config/<event_id>', methods=['PUT'])
+def replace_event_config(event_id):
+    """Update an existing event configuration."""
+    try:
+        # Normalise the id so cache and change feed keys match however the URL spelled it
+        event_id = str(parse_object_id(event_id))
+        data = request.json
+        event_config = EventConfig(**data)
+        if not update_event_config(db, event_id, event_config):
+            return jsonify({"error": "Event not found"}), 404
+        event_config_changed(event_id)
+        return jsonify({"message": "Event config updated", "id": event_id}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @app.route('/event-config/<event_id>', methods=['GET'])
 def get_event_config(event_id):
-    """Get event configuration by ID."""
+    """Get event configuration by ID (cached, supports If-None-Match)."""
     try:
-        event = db.event_configs.find_one({"_id": event_id})
-        if not event:
+        event_id = str(parse_object_id(event_id))
+        cached = event_config_cache.get_or_load(event_id, lambda: load_event_config(event_id))
+        if not cached:
             return jsonify({"error": "Event not found"}), 404
-        return jsonify(event), 200
+        response = jsonify(cached["body"])
+        response.set_etag(cached["etag"])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/event-configs', methods=['GET'])
+def list_event_configs():
+    """List event configurations that have not ended, including upcoming ones."""
+    try:
+        # Read the version first so consumers never skip a change made during the query
+        version, epoch = event_config_changes.version, event_config_changes.epoch
+        events = find_current_event_configs(db)
+        return jsonify({
+            "version": version,
+            "epoch": epoch,
+            "events": [serialize_document(event) for event in events]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/event-configs/changes', methods=['GET'])
+def get_event_config_changes():
+    """Report event configs changed since a version; served from memory, no database access."""
+    epoch = request.args.get('epoch')
+    since = request.args.get('since', 0, type=int)
+    return jsonify(event_config_changes.changes_since(epoch, since)), 200
+
 @app.route('/user-lead', methods=['POST'])
 def create_user_lead():
     """Create a new user lead with associated images."""
     try:
         data = request.json
         user_lead = UserLead(**data)
-        result = db.user_leads.insert_one(user_lead.dict())
-        return jsonify({"message": "User lead created", "id": str(result.inserted_id)}), 201
+        lead_id = insert_user_lead(db, user_lead)
+        return jsonify({"message": "User lead created", "id": str(lead_id)}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def bulk_insert_response(insert, key):
+    """Run a bulk insert for the list under ``key`` and report per-item results."""
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": f"Expected a non-empty list of {key}"}), 400
+    if len(items) > BULK_INSERT_MAX_ITEMS:
+        return jsonify({"error": f"At most {BULK_INSERT_MAX_ITEMS} {key} per request"}), 413
+
+    try:
+        require_indexes()
+    except PyMongoError as e:
+        logger.error(f"Failed to ensure MongoDB indexes: {str(e)}")
+        return jsonify({"error": "Database indexes are not ready, retry later"}), 503
+
+    results = insert(db, items)
+    inserted = sum(1 for result in results if result["status"] == "inserted")
+    status_code = 201 if inserted == len(results) else 207
+    return jsonify({
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results
+    }), status_code
+
+@app.route('/user-leads/bulk', methods=['POST'])
+def create_user_leads_bulk():
+    """Create many user leads in one request."""
+    try:
+        return bulk_insert_response(insert_user_leads, "leads")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/image-metadata/bulk', methods=['POST'])
+def create_image_metadata_bulk():
+    """Record metadata for many generated images in one request."""
+    try:
+        return bulk_insert_response(insert_image_metadata, "images")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/upload-image', methods=['POST'])
 def upload_image():
     """Upload image to S3 bucket."""
@@ -72,28 +206,127 @@ def upload_image():
             return jsonify({"error": "No file selected"}), 400
 
         # Generate unique filename
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{file.filename}"
+        filename = make_object_key(file.filename)
         
         # Upload to S3
-        s3_client.upload_fileobj(
-            file,
-            AWS_BUCKET_NAME,
-            filename,
-            ExtraArgs={'ACL': 'public-read'}
-        )
-
-        # Generate S3 URL
-        image_url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{filename}"
-        
+        upload_fileobj(file, filename, content_type=file.mimetype)
+
         return jsonify({
             "message": "Image uploaded successfully",
-            "url": image_url
+            "url": object_url(filename)
         }), 200
     except ClientError as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def check_direct_upload(data):
+    """Validate filename, content type and declared size of a direct upload request.
+
+    Returns ``(error_response, None)`` on failure or ``(None, size)``.
+    """
+    if not data.get('filename'):
+        return (jsonify({"error": "No filename provided"}), 400), None
+    if data.get('content_type') not in ALLOWED_UPLOAD_CONTENT_TYPES:
+        return (jsonify({
+            "error": f"content_type must be one of: {', '.join(ALLOWED_UPLOAD_CONTENT_TYPES)}"
+        }), 400), None
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        size = 0
+    if size <= 0:
+        return (jsonify({"error": "A positive size in bytes is required"}), 400), None
+    if size > MAX_UPLOAD_SIZE_MB * MB:
+        return (jsonify({"error": f"File exceeds {MAX_UPLOAD_SIZE_MB} MB limit"}), 413), None
+    return None, size
+
+@app.route('/upload-url', methods=['POST'])
+def create_upload_url():
+    """Issue a presigned PUT or POST so the client uploads straight to S3."""
+    try:
+        data = request.get_json(silent=True) or {}
+        error, size = check_direct_upload(data)
+        if error:
+            return error
+        content_type = data['content_type']
+        method = str(data.get('method', 'put')).lower()
+
+        key = make_object_key(data['filename'])
+        if method == 'put':
+            upload = create_presigned_put(key, content_type, size)
+        elif method == 'post':
+            upload = create_presigned_post(key, content_type, size)
+        else:
+            return jsonify({"error": "method must be 'put' or 'post'"}), 400
+
+        return jsonify({
+            **upload,
+            "key": key,
+            "image_url": object_url(key),
+            "expires_in": PRESIGNED_URL_EXPIRES
+        }), 200
+    except ClientError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/multipart-upload', methods=['POST'])
+def start_multipart_upload():
+    """Start a multipart upload and return presigned URLs for each part."""
+    try:
+        data = request.get_json(silent=True) or {}
+        error, size = check_direct_upload(data)
+        if error:
+            return error
+
+        key = make_object_key(data['filename'])
+        upload = create_multipart_upload(key, data['content_type'], size)
+        return jsonify({
+            **upload,
+            "key": key,
+            "image_url": object_url(key),
+            "expires_in": PRESIGNED_URL_EXPIRES
+        }), 200
+    except ClientError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/multipart-upload/complete', methods=['POST'])
+def finish_multipart_upload():
+    """Complete a multipart upload from the part ETags the client collected."""
+    try:
+        data = request.get_json(silent=True) or {}
+        key = data.get('key')
+        upload_id = data.get('upload_id')
+        parts = data.get('parts')
+        if not key or not upload_id or not parts:
+            return jsonify({"error": "key, upload_id and parts are required"}), 400
+
+        complete_multipart_upload(key, upload_id, parts)
+        return jsonify({"message": "Image uploaded successfully", "url": object_url(key)}), 200
+    except ClientError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/multipart-upload/abort', methods=['POST'])
+def cancel_multipart_upload():
+    """Abort a multipart upload the client gave up on."""
+    try:
+        data = request.get_json(silent=True) or {}
+        key = data.get('key')
+        upload_id = data.get('upload_id')
+        if not key or not upload_id:
+            return jsonify({"error": "key and upload_id are required"}), 400
+
+        abort_multipart_upload(key, upload_id)
+        return jsonify({"message": "Upload aborted"}), 200
+    except ClientError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5003) 
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Measure insert and lookup throughput of the data-access layer under concurrency.
+
+Also compares single-document lead inserts with batched inserts through the
+bulk path (insert_many, ordered=False) at several batch sizes.
+
+Runs against the MongoDB at MONGODB_URI (a local mongod) or, with --mongomock,
+against an in-memory stand-in. mongomock numbers only exercise the Python
+side and say nothing about server or pool behaviour.
+
+Usage:
+    python benchmark_db.py --operations 5000 --concurrency 1 8 32 --batch-sizes 10 100
+    python benchmark_db.py --mongomock
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import EventConfig, TransformationStyle, UserLead
+from repository import (
+    ensure_indexes, find_event_config, insert_event_config,
+    insert_user_lead, insert_user_leads
+)
+
+BENCHMARK_DATABASE = 'photo_op_benchmark'
+
+
+def get_benchmark_database(use_mongomock):
+    """Return a scratch database on the configured server or on mongomock."""
+    if use_mongomock:
+        import mongomock
+        return mongomock.MongoClient()[BENCHMARK_DATABASE]
+    from config import get_client
+    return get_client()[BENCHMARK_DATABASE]
+
+
+def make_event_config(i):
+    now = datetime.utcnow()
+    return EventConfig(
+        event_name=f"Benchmark event {i}",
+        start_date=now,
+        end_date=now + timedelta(days=1),
+        transformation_styles=[TransformationStyle(id='anime', name='Anime', prompt='anime style portrait')],
+        email_template='Hello {name}'
+    )
+
+
+def make_user_lead(i, event_id):
+    return UserLead(email=f"guest{i}@example.com", name=f"Guest {i}", event_id=event_id)
+
+
+def timed_run(fn, count, concurrency):
+    """Run ``fn(i)`` for i in range(count) on a thread pool and return ops/sec."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fn, range(count)))
+    elapsed = time.perf_counter() - start
+    return round(count / elapsed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--mongomock', action='store_true')
+    args = parser.parse_args()
+
+    db = get_benchmark_database(args.mongomock)
+    db.client.drop_database(BENCHMARK_DATABASE)
+    if not args.mongomock:
+        ensure_indexes(db)
+
+    event_ids = [str(insert_event_config(db, make_event_config(i))) for i in range(100)]
+
+    results = []
+    for concurrency in args.concurrency:
+        insert_rate = timed_run(
+            lambda i: insert_user_lead(db, make_user_lead(i, event_ids[i % len(event_ids)])),
+            args.operations, concurrency
+        )
+        lookup_rate = timed_run(
+            lambda i: find_event_config(db, event_ids[i % len(event_ids)]),
+            args.operations, concurrency
+        )
+        results.append({
+            'concurrency': concurrency,
+            'user_lead_inserts_per_sec': insert_rate,
+            'event_config_lookups_per_sec': lookup_rate
+        })
+        print(f"concurrency={concurrency}: {insert_rate} inserts/s, {lookup_rate} lookups/s")
+
+    batched = []
+    for batch_size in args.batch_sizes:
+        batches = (args.operations + batch_size - 1) // batch_size
+
+        def insert_batch(b):
+            first = b * batch_size
+            last = min(first + batch_size, args.operations)
+            leads = [
+                make_user_lead(i, event_ids[i % len(event_ids)]).dict()
+                for i in range(first, last)
+            ]
+            insert_user_leads(db, leads)
+
+        start = time.perf_counter()
+        for b in range(batches):
+            insert_batch(b)
+        rate = round(args.operations / (time.perf_counter() - start), 1)
+        batched.append({'batch_size': batch_size, 'user_lead_inserts_per_sec': rate})
+        print(f"batch_size={batch_size}: {rate} inserts/s")
+
+    single_rate = timed_run(
+        lambda i: insert_user_lead(db, make_user_lead(i, event_ids[i % len(event_ids)])),
+        args.operations, 1
+    )
+    print(f"single inserts: {single_rate} inserts/s")
+
+    db.client.drop_database(BENCHMARK_DATABASE)
+    print(json.dumps({
+        'backend': 'mongomock' if args.mongomock else 'mongod',
+        'results': results,
+        'single_vs_batched': {
+            'single_inserts_per_sec': single_rate,
+            'batched': batched
+        }
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compare proxied and direct-to-S3 upload throughput.
+
+Proxied uploads go through POST /upload-image on a running database-service;
+direct uploads fetch a presigned PUT from /upload-url and send the bytes
+straight to the bucket. Point the service at MinIO or a moto server with
+S3_ENDPOINT_URL to run this locally, e.g.:
+
+    moto_server -p 9000 &
+    S3_ENDPOINT_URL=http://localhost:9000 python app.py &
+    python benchmark_uploads.py --size-kb 512 --uploads 100 --concurrency 1 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def proxied_upload(session, service_url, payload, i):
+    response = session.post(
+        f"{service_url}/upload-image",
+        files={'file': (f"bench_{i}.png", payload, 'image/png')}
+    )
+    response.raise_for_status()
+
+
+def direct_upload(session, service_url, payload, i):
+    presigned = session.post(
+        f"{service_url}/upload-url",
+        json={'filename': f"bench_{i}.png", 'content_type': 'image/png', 'size': len(payload)}
+    )
+    presigned.raise_for_status()
+    upload = presigned.json()
+    response = session.put(upload['url'], data=payload, headers=upload['headers'])
+    response.raise_for_status()
+
+
+def run(upload, service_url, payload, uploads, concurrency):
+    """Run ``uploads`` uploads on ``concurrency`` threads and return throughput."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda i: upload(session, service_url, payload, i), range(uploads)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'uploads_per_sec': round(uploads / elapsed, 1),
+        'mb_per_sec': round(uploads * len(payload) / (1024 * 1024) / elapsed, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--service-url', default=os.getenv('DATABASE_SERVICE_URL', 'http://localhost:5003'))
+    parser.add_argument('--size-kb', type=int, default=512)
+    parser.add_argument('--uploads', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_kb * 1024)
+    results = []
+    for concurrency in args.concurrency:
+        proxied = run(proxied_upload, args.service_url, payload, args.uploads, concurrency)
+        direct = run(direct_upload, args.service_url, payload, args.uploads, concurrency)
+        results.append({'concurrency': concurrency, 'proxied': proxied, 'direct': direct})
+        print(f"concurrency={concurrency}: proxied {proxied['mb_per_sec']} MB/s, direct {direct['mb_per_sec']} MB/s")
+
+    print(json.dumps({'size_kb': args.size_kb, 'uploads': args.uploads, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Each key has a generation that ``invalidate`` bumps, so a load that
+    started before an invalidation cannot put its stale value back.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generations: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= self._timer():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (value, self._timer() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Return the cached value, calling ``loader`` on a miss; None results are not cached.
+
+        The loaded value is returned to the caller but only cached if ``key``
+        was not invalidated while the loader ran.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        value = loader()
+        if value is not None:
+            with self._lock:
+                if self._generations.get(key, 0) == generation:
+                    self._store(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class ChangeFeed:
+    """In-process version counter recording which keys changed at each version.
+
+    ``epoch`` is regenerated on every start so consumers can tell a restarted
+    service (version reset to 0) from one with no changes. Only the last
+    ``max_history`` changes are kept; older cursors are told to reset.
+    """
+
+    def __init__(self, max_history: int = 1000):
+        self.epoch = uuid.uuid4().hex
+        self.version = 0
+        self._history: deque = deque(maxlen=max_history)
+        self._lock = threading.Lock()
+
+    def record(self, key: str) -> int:
+        with self._lock:
+            self.version += 1
+            self._history.append((self.version, key))
+            return self.version
+
+    def changes_since(self, epoch: Optional[str], since: int) -> Dict[str, Any]:
+        """Describe changes after ``since``; ``reset`` means the consumer must reload everything."""
+        with self._lock:
+            oldest = self._history[0][0] if self._history else self.version + 1
+            missed_history = since + 1 < oldest and since < self.version
+            reset = epoch != self.epoch or since > self.version or missed_history
+            changed = [] if reset else sorted({key for version, key in self._history if version > since})
+            return {
+                "epoch": self.epoch,
+                "version": self.version,
+                "reset": reset,
+                "changed": changed
+            }
@@ -10,16 +10,64 @@ load_dotenv()
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'photo_op')
 
+# MongoDB connection pool configuration
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 50))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', 5))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 60000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 2000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 5000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', 10000))
+
+# Maximum number of documents accepted by a single bulk insert request
+BULK_INSERT_MAX_ITEMS = int(os.getenv('BULK_INSERT_MAX_ITEMS', 1000))
+
+# Event configuration cache
+EVENT_CONFIG_CACHE_TTL = float(os.getenv('EVENT_CONFIG_CACHE_TTL', 60))
+EVENT_CONFIG_CACHE_MAX_SIZE = int(os.getenv('EVENT_CONFIG_CACHE_MAX_SIZE', 256))
+
 # AWS S3 configuration
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_BUCKET_NAME = os.getenv('AWS_BUCKET_NAME')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+# Custom endpoint for S3-compatible stand-ins (MinIO, moto server)
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))
+S3_TRANSFER_MAX_CONCURRENCY = int(os.getenv('S3_TRANSFER_MAX_CONCURRENCY', 10))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', 8))
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv('S3_MULTIPART_CHUNKSIZE_MB', 8))
+PRESIGNED_URL_EXPIRES = int(os.getenv('PRESIGNED_URL_EXPIRES', 900))
+MAX_UPLOAD_SIZE_MB = int(os.getenv('MAX_UPLOAD_SIZE_MB', 50))
+# Content types clients may upload directly; SVG is excluded since it can carry script
+ALLOWED_UPLOAD_CONTENT_TYPES = [
+    content_type.strip() for content_type in
+    os.getenv('ALLOWED_UPLOAD_CONTENT_TYPES', 'image/jpeg,image/png,image/webp').split(',')
+    if content_type.strip()
+]
+
+_client = None
+
+def get_client() -> MongoClient:
+    """Get the shared, pooled MongoDB client (created on first use)."""
+    global _client
+    if _client is None:
+        _client = MongoClient(
+            MONGODB_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+            retryWrites=True
+        )
+    return _client
 
 def get_database() -> Database:
     """Get MongoDB database instance."""
-    client = MongoClient(MONGODB_URI)
-    return client[DATABASE_NAME]
+    return get_client()[DATABASE_NAME]
 
 # Initialize database collections
 db = get_database()
@@ -0,0 +1,9 @@
+import os
+
+# Settings read by config.py at import: fail fast when no MongoDB is running,
+# and give storage a bucket and credentials that moto accepts
+os.environ.setdefault('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '100')
+os.environ.setdefault('AWS_BUCKET_NAME', 'photo-op-test')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
@@ -21,6 +21,7 @@ class ImageMetadata(BaseModel):
     original_image_path: str
     transformed_image_path: str
     transformation_style: str
+    request_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UserLead(BaseModel):
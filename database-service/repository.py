@@ -0,0 +1,130 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type
+
+from bson import ObjectId
+from pydantic import BaseModel, ValidationError
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from models import EventConfig, ImageMetadata, UserLead
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+INDEXES = {
+    'user_leads': [
+        IndexModel([('event_id', ASCENDING), ('created_at', DESCENDING)], name='event_id_created_at'),
+        IndexModel([('email', ASCENDING)], name='email'),
+    ],
+    'event_configs': [
+        IndexModel([('start_date', ASCENDING), ('end_date', ASCENDING)], name='start_date_end_date'),
+        IndexModel([('end_date', ASCENDING)], name='end_date'),
+    ],
+    'image_metadata': [
+        # Unique so re-sent write-behind batches cannot duplicate a request's record
+        IndexModel(
+            [('request_id', ASCENDING)], name='request_id_unique', unique=True,
+            partialFilterExpression={'request_id': {'$type': 'string'}}
+        ),
+        IndexModel([('created_at', DESCENDING)], name='created_at'),
+    ],
+}
+
+def ensure_indexes(db: Database) -> None:
+    """Create the indexes the service queries rely on (no-op if they exist)."""
+    for collection, indexes in INDEXES.items():
+        names = db[collection].create_indexes(indexes)
+        logger.info(f"Ensured indexes on {collection}: {names}")
+
+def parse_object_id(value: str) -> ObjectId:
+    """Convert a string id from a URL or payload into an ObjectId."""
+    if not ObjectId.is_valid(value):
+        raise ValueError(f"Invalid id: {value}")
+    return ObjectId(value)
+
+def serialize_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a Mongo document JSON-serializable by stringifying its ObjectId."""
+    document = dict(document)
+    if '_id' in document:
+        document['id'] = str(document.pop('_id'))
+    return document
+
+def insert_event_config(db: Database, event_config: EventConfig) -> ObjectId:
+    """Insert an event configuration and return its id."""
+    return db.event_configs.insert_one(event_config.dict()).inserted_id
+
+def find_event_config(db: Database, event_id: str) -> Optional[Dict[str, Any]]:
+    """Look up an event configuration by its string id."""
+    return db.event_configs.find_one({'_id': parse_object_id(event_id)})
+
+def update_event_config(db: Database, event_id: str, event_config: EventConfig) -> bool:
+    """Replace an event configuration's fields, keeping its created_at; returns False if missing."""
+    fields = event_config.dict(exclude={'created_at'})
+    fields['updated_at'] = datetime.utcnow()
+    result = db.event_configs.update_one({'_id': parse_object_id(event_id)}, {'$set': fields})
+    return result.matched_count > 0
+
+def find_current_event_configs(db: Database, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """List event configurations that have not ended yet, including upcoming ones."""
+    now = now or datetime.utcnow()
+    return list(db.event_configs.find({'end_date': {'$gte': now}}))
+
+def insert_user_lead(db: Database, user_lead: UserLead) -> ObjectId:
+    """Insert a user lead and return its id."""
+    return db.user_leads.insert_one(user_lead.dict()).inserted_id
+
+def bulk_insert(db: Database, collection: str, model: Type[BaseModel], items: List[Any]) -> List[Dict[str, Any]]:
+    """Validate and insert many documents, returning one result per input item.
+
+    Items are validated individually; the valid ones are written with a single
+    unordered insert_many so one bad document does not block the rest.
+    Each result has the item's index, a status of "inserted", "invalid" or
+    "failed", and either the new id or an error message. Duplicate-key errors
+    count as "inserted" (flagged ``duplicate``, without an id) so clients can
+    safely re-send a batch whose response they never received.
+    """
+    results: List[Dict[str, Any]] = [None] * len(items)
+    documents = []
+    positions = []
+
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise TypeError("Item must be an object")
+            documents.append(model(**item).dict())
+            positions.append(index)
+        except (ValidationError, TypeError) as e:
+            results[index] = {"index": index, "status": "invalid", "error": str(e)}
+
+    if not documents:
+        return results
+
+    write_errors = {}
+    try:
+        db[collection].insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        # writeErrors index into ``documents``, not into ``items``
+        write_errors = {error['index']: error for error in e.details.get('writeErrors', [])}
+
+    # insert_many sets _id on each document before sending, even on failure
+    for batch_index, (index, document) in enumerate(zip(positions, documents)):
+        error = write_errors.get(batch_index)
+        if error is not None and error.get('code') == DUPLICATE_KEY_ERROR:
+            results[index] = {"index": index, "status": "inserted", "duplicate": True}
+        elif error is not None:
+            results[index] = {"index": index, "status": "failed", "error": error.get('errmsg', 'Write failed')}
+        else:
+            results[index] = {"index": index, "status": "inserted", "id": str(document['_id'])}
+
+    return results
+
+def insert_user_leads(db: Database, items: List[Any]) -> List[Dict[str, Any]]:
+    """Bulk-insert user leads with per-item results."""
+    return bulk_insert(db, 'user_leads', UserLead, items)
+
+def insert_image_metadata(db: Database, items: List[Any]) -> List[Dict[str, Any]]:
+    """Bulk-insert generated image metadata with per-item results."""
+    return bulk_insert(db, 'image_metadata', ImageMetadata, items)
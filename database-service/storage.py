@@ -0,0 +1,146 @@
+import math
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from config import (
+    AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_BUCKET_NAME, AWS_REGION,
+    S3_ENDPOINT_URL, S3_MAX_POOL_CONNECTIONS, S3_TRANSFER_MAX_CONCURRENCY,
+    S3_MULTIPART_THRESHOLD_MB, S3_MULTIPART_CHUNKSIZE_MB, PRESIGNED_URL_EXPIRES
+)
+
+MB = 1024 * 1024
+# S3 rejects multipart uploads with more parts than this
+MAX_MULTIPART_PARTS = 10000
+UPLOAD_ACL = 'public-read'
+
+# Tuned for proxied uploads: large pool so concurrent requests don't queue on
+# connections, and parallel part uploads for files over the threshold
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD_MB * MB,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * MB,
+    max_concurrency=S3_TRANSFER_MAX_CONCURRENCY,
+    use_threads=True
+)
+
+_s3_client = None
+
+def get_s3_client():
+    """Get the shared S3 client (created on first use; boto3 clients are thread-safe)."""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            's3',
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            region_name=AWS_REGION,
+            endpoint_url=S3_ENDPOINT_URL,
+            config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                retries={'max_attempts': 3, 'mode': 'standard'},
+                signature_version='s3v4'
+            )
+        )
+    return _s3_client
+
+def make_object_key(filename: str) -> str:
+    """Build a unique, URL-safe object key for an uploaded file."""
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', filename).strip('_') or 'upload'
+    return f"{timestamp}_{uuid.uuid4().hex[:8]}_{safe_name}"
+
+def object_url(key: str) -> str:
+    """Public URL of an uploaded object."""
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{AWS_BUCKET_NAME}/{key}"
+    return f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{key}"
+
+def upload_fileobj(fileobj, key: str, content_type: Optional[str] = None) -> None:
+    """Stream a file-like object to the bucket using the tuned transfer config."""
+    extra_args = {'ACL': UPLOAD_ACL}
+    if content_type:
+        extra_args['ContentType'] = content_type
+    get_s3_client().upload_fileobj(fileobj, AWS_BUCKET_NAME, key, ExtraArgs=extra_args, Config=TRANSFER_CONFIG)
+
+def create_presigned_put(key: str, content_type: str, size: int) -> Dict[str, Any]:
+    """Presign a PUT of exactly ``size`` bytes; the client must send the returned headers unchanged."""
+    url = get_s3_client().generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': AWS_BUCKET_NAME, 'Key': key, 'ContentType': content_type,
+            'ContentLength': size, 'ACL': UPLOAD_ACL
+        },
+        ExpiresIn=PRESIGNED_URL_EXPIRES
+    )
+    return {
+        'method': 'PUT',
+        'url': url,
+        'headers': {'Content-Type': content_type, 'Content-Length': str(size), 'x-amz-acl': UPLOAD_ACL}
+    }
+
+def create_presigned_post(key: str, content_type: str, max_size: int) -> Dict[str, Any]:
+    """Presign a browser form POST limited to ``max_size`` bytes."""
+    post = get_s3_client().generate_presigned_post(
+        AWS_BUCKET_NAME,
+        key,
+        Fields={'Content-Type': content_type, 'acl': UPLOAD_ACL},
+        Conditions=[
+            {'Content-Type': content_type},
+            {'acl': UPLOAD_ACL},
+            ['content-length-range', 1, max_size]
+        ],
+        ExpiresIn=PRESIGNED_URL_EXPIRES
+    )
+    return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+def create_multipart_upload(key: str, content_type: str, size: int) -> Dict[str, Any]:
+    """Start a multipart upload and presign a PUT URL for every part.
+
+    Each part URL is signed with that part's exact Content-Length, so the
+    assembled object can never exceed the declared ``size``.
+    """
+    client = get_s3_client()
+    part_size = max(S3_MULTIPART_CHUNKSIZE_MB * MB, math.ceil(size / MAX_MULTIPART_PARTS))
+    part_count = max(1, math.ceil(size / part_size))
+
+    upload = client.create_multipart_upload(
+        Bucket=AWS_BUCKET_NAME, Key=key, ContentType=content_type, ACL=UPLOAD_ACL
+    )
+    upload_id = upload['UploadId']
+    parts = []
+    for part_number in range(1, part_count + 1):
+        part_length = min(part_size, size - (part_number - 1) * part_size)
+        parts.append({
+            'part_number': part_number,
+            'size': part_length,
+            'url': client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': AWS_BUCKET_NAME, 'Key': key, 'UploadId': upload_id,
+                    'PartNumber': part_number, 'ContentLength': part_length
+                },
+                ExpiresIn=PRESIGNED_URL_EXPIRES
+            )
+        })
+    return {'upload_id': upload_id, 'part_size': part_size, 'parts': parts}
+
+def complete_multipart_upload(key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+    """Assemble uploaded parts; ``parts`` holds each part_number and the ETag S3 returned."""
+    get_s3_client().complete_multipart_upload(
+        Bucket=AWS_BUCKET_NAME,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': sorted(
+            ({'PartNumber': int(part['part_number']), 'ETag': part['etag']} for part in parts),
+            key=lambda part: part['PartNumber']
+        )}
+    )
+
+def abort_multipart_upload(key: str, upload_id: str) -> None:
+    """Abort a multipart upload and free its stored parts."""
+    get_s3_client().abort_multipart_upload(Bucket=AWS_BUCKET_NAME, Key=key, UploadId=upload_id)
@@ -0,0 +1,81 @@
+import mongomock
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import app as app_module
+from cache import ChangeFeed, TTLCache
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock.MongoClient().db
+    monkeypatch.setattr(app_module, 'db', database)
+    # No MongoDB is reachable at import, so the indexes are still pending
+    monkeypatch.setattr(app_module, 'indexes_ready', False)
+    monkeypatch.setattr(app_module, 'event_config_cache', TTLCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(app_module, 'event_config_changes', ChangeFeed())
+    return database
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def image(request_id):
+    return {
+        'original_image_path': 'upload.png',
+        'transformed_image_path': f'generated_{request_id}.png',
+        'transformation_style': 'anime',
+        'request_id': request_id,
+    }
+
+
+def test_bulk_insert_creates_missing_indexes_first(db, client):
+    response = client.post('/image-metadata/bulk', json={'images': [image('req1')]})
+
+    assert response.status_code == 201
+    assert 'request_id_unique' in db.image_metadata.index_information()
+    assert app_module.indexes_ready is True
+
+
+def test_bulk_insert_is_refused_until_indexes_exist(db, client, monkeypatch):
+    def unreachable(database):
+        raise ServerSelectionTimeoutError('localhost:27017: connection refused')
+
+    monkeypatch.setattr(app_module, 'ensure_indexes', unreachable)
+    response = client.post('/image-metadata/bulk', json={'images': [image('req1')]})
+
+    assert response.status_code == 503
+    assert db.image_metadata.count_documents({}) == 0
+    assert app_module.indexes_ready is False
+
+
+def event_config(name='Launch party'):
+    return {
+        'event_name': name,
+        'start_date': '2024-01-01T00:00:00',
+        'end_date': '2099-01-01T00:00:00',
+        'transformation_styles': [{'id': 'anime', 'name': 'Anime', 'prompt': 'anime style'}],
+        'email_template': 'Your photo is ready',
+    }
+
+
+def test_event_config_update_invalidates_however_the_id_is_spelled(db, client):
+    event_id = client.post('/event-config', json=event_config()).get_json()['id']
+    assert client.get(f'/event-config/{event_id}').get_json()['event_name'] == 'Launch party'
+
+    response = client.put(f'/event-config/{event_id.upper()}', json=event_config('After party'))
+
+    assert response.status_code == 200
+    assert client.get(f'/event-config/{event_id}').get_json()['event_name'] == 'After party'
+    changes = app_module.event_config_changes.changes_since(app_module.event_config_changes.epoch, 0)
+    assert changes['changed'] == [event_id]
+
+
+@pytest.mark.parametrize('method', ['get', 'put'])
+def test_malformed_event_id_is_rejected(db, client, method):
+    response = getattr(client, method)('/event-config/not-an-id', json=event_config())
+
+    assert response.status_code == 400
+    assert app_module.event_config_changes.version == 0
@@ -0,0 +1,108 @@
+from cache import ChangeFeed, TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=30, timer=timer)
+    cache.set('event', 'config')
+
+    timer.now = 29.9
+    assert cache.get('event') == 'config'
+    timer.now = 30
+    assert cache.get('event') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=30, timer=FakeTimer())
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_get_or_load_caches_loaded_values_but_not_misses():
+    cache = TTLCache(maxsize=10, ttl=30, timer=FakeTimer())
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None if len(calls) == 1 else 'config'
+
+    assert cache.get_or_load('event', loader) is None
+    assert cache.get_or_load('event', loader) == 'config'
+    assert cache.get_or_load('event', loader) == 'config'
+    assert len(calls) == 2
+
+
+def test_invalidate_during_load_does_not_cache_stale_value():
+    cache = TTLCache(maxsize=10, ttl=30, timer=FakeTimer())
+
+    def stale_loader():
+        # A concurrent update lands while the old document is being read
+        cache.invalidate('event')
+        return 'old config'
+
+    assert cache.get_or_load('event', stale_loader) == 'old config'
+    assert cache.get('event') is None
+    assert cache.get_or_load('event', lambda: 'new config') == 'new config'
+    assert cache.get('event') == 'new config'
+
+
+def test_invalidate_removes_cached_entry():
+    cache = TTLCache(maxsize=10, ttl=30, timer=FakeTimer())
+    cache.set('event', 'config')
+    cache.invalidate('event')
+
+    assert cache.get('event') is None
+
+
+def test_change_feed_requires_reset_for_unknown_epoch():
+    feed = ChangeFeed()
+    feed.record('a')
+
+    assert feed.changes_since(None, 0)['reset'] is True
+    assert feed.changes_since('previous-run', 1)['reset'] is True
+
+
+def test_change_feed_lists_keys_changed_since_version():
+    feed = ChangeFeed()
+    for key in ['a', 'b', 'a', 'c']:
+        feed.record(key)
+
+    changes = feed.changes_since(feed.epoch, 1)
+    assert changes == {'epoch': feed.epoch, 'version': 4, 'reset': False, 'changed': ['a', 'b', 'c']}
+    assert feed.changes_since(feed.epoch, 4)['changed'] == []
+    assert feed.changes_since(feed.epoch, 0)['reset'] is False
+
+
+def test_change_feed_resets_consumers_that_missed_history():
+    feed = ChangeFeed(max_history=2)
+    for key in ['a', 'b', 'c']:
+        feed.record(key)
+
+    # Version 1 was evicted, so a consumer at version 0 cannot catch up
+    assert feed.changes_since(feed.epoch, 0)['reset'] is True
+    changes = feed.changes_since(feed.epoch, 1)
+    assert changes['reset'] is False
+    assert changes['changed'] == ['b', 'c']
+    # Up-to-date consumers never need a reset, even with a trimmed history
+    assert feed.changes_since(feed.epoch, 3)['reset'] is False
+
+
+def test_change_feed_resets_consumers_ahead_of_version():
+    feed = ChangeFeed()
+    feed.record('a')
+
+    assert feed.changes_since(feed.epoch, 5)['reset'] is True
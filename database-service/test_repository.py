@@ -0,0 +1,69 @@
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from repository import ensure_indexes, insert_image_metadata, insert_user_leads
+
+
+@pytest.fixture
+def db():
+    database = mongomock.MongoClient().db
+    ensure_indexes(database)
+    return database
+
+
+def image(request_id, style='anime'):
+    return {
+        'original_image_path': 'upload.png',
+        'transformed_image_path': f'generated_{request_id}.png',
+        'transformation_style': style,
+        'request_id': request_id,
+    }
+
+
+def lead(i):
+    return {'email': f'guest{i}@example.com', 'name': f'Guest {i}', 'event_id': 'event'}
+
+
+def test_bulk_insert_reports_invalid_items_at_their_input_index(db):
+    results = insert_user_leads(db, [lead(0), {'name': 'no email'}, 'not an object', lead(3)])
+
+    assert [result['status'] for result in results] == ['inserted', 'invalid', 'invalid', 'inserted']
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert db.user_leads.count_documents({}) == 2
+    for result in (results[0], results[3]):
+        assert db.user_leads.find_one({'_id': ObjectId(result['id'])}) is not None
+
+
+def test_bulk_insert_with_only_invalid_items_writes_nothing(db):
+    results = insert_user_leads(db, [{'email': 'not-an-email', 'name': 'x', 'event_id': 'e'}])
+
+    assert results[0]['status'] == 'invalid'
+    assert db.user_leads.count_documents({}) == 0
+
+
+def test_write_errors_map_back_to_input_indexes(db, monkeypatch):
+    def failing_insert_many(self, documents, ordered=True):
+        assert ordered is False
+        for document in documents:
+            document['_id'] = ObjectId()
+        # Batch index 1 is the third input item, since the first is invalid
+        raise BulkWriteError({'writeErrors': [{'index': 1, 'code': 121, 'errmsg': 'Document failed validation'}]})
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'insert_many', failing_insert_many)
+    results = insert_user_leads(db, [{'name': 'no email'}, lead(1), lead(2), lead(3)])
+
+    assert [result['status'] for result in results] == ['invalid', 'inserted', 'failed', 'inserted']
+    assert results[2]['error'] == 'Document failed validation'
+
+
+def test_resent_image_metadata_batch_is_not_duplicated(db):
+    first = insert_image_metadata(db, [image('req1'), image('req2')])
+    # The response to the first batch was lost, so the client re-sends it with a new record
+    retry = insert_image_metadata(db, [image('req1'), image('req2'), image('req3')])
+
+    assert all(result['status'] == 'inserted' for result in first + retry)
+    assert [result.get('duplicate', False) for result in retry] == [True, True, False]
+    assert db.image_metadata.count_documents({}) == 3
+    assert db.image_metadata.count_documents({'request_id': 'req1'}) == 1
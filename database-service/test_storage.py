@@ -0,0 +1,111 @@
+import base64
+import json
+from urllib.parse import parse_qs, urlparse
+
+import boto3
+import pytest
+import requests
+from moto import mock_aws
+
+import app as app_module
+import storage
+from config import AWS_BUCKET_NAME, AWS_REGION
+from storage import MB
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    with mock_aws():
+        monkeypatch.setattr(storage, '_s3_client', None)
+        client = boto3.client('s3', region_name=AWS_REGION)
+        client.create_bucket(Bucket=AWS_BUCKET_NAME)
+        yield client
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def request_upload(client, path, size, content_type='image/png', **extra):
+    return client.post(path, json={'filename': 'photo.png', 'content_type': content_type, 'size': size, **extra})
+
+
+def signed_headers(url):
+    return parse_qs(urlparse(url).query)['X-Amz-SignedHeaders'][0].split(';')
+
+
+# moto does not verify presigned signatures, so these tests upload through the
+# issued URLs and check the signed headers and policy S3 enforces separately
+
+
+def test_presigned_put_uploads_and_signs_type_and_length(s3, client):
+    upload = request_upload(client, '/upload-url', 10).get_json()
+
+    assert {'content-length', 'content-type'} <= set(signed_headers(upload['url']))
+    assert upload['headers']['Content-Length'] == '10'
+    response = requests.put(upload['url'], data=b'x' * 10, headers=upload['headers'])
+    assert response.status_code == 200
+    stored = s3.head_object(Bucket=AWS_BUCKET_NAME, Key=upload['key'])
+    assert (stored['ContentLength'], stored['ContentType']) == (10, 'image/png')
+
+
+def test_presigned_post_uploads_within_policy_limits(s3, client):
+    upload = request_upload(client, '/upload-url', 10, method='post').get_json()
+
+    policy = json.loads(base64.b64decode(upload['fields']['policy']))
+    assert ['content-length-range', 1, 10] in policy['conditions']
+    assert {'Content-Type': 'image/png'} in policy['conditions']
+    response = requests.post(upload['url'], data=upload['fields'], files={'file': b'x' * 10})
+    assert response.status_code == 204
+    assert s3.head_object(Bucket=AWS_BUCKET_NAME, Key=upload['key'])['ContentLength'] == 10
+
+
+def test_multipart_upload_signs_each_part_length_and_completes(s3, client):
+    size = 9 * MB
+    upload = request_upload(client, '/multipart-upload', size).get_json()
+
+    assert [part['size'] for part in upload['parts']] == [8 * MB, 1 * MB]
+    parts = []
+    for part in upload['parts']:
+        assert 'content-length' in signed_headers(part['url'])
+        response = requests.put(part['url'], data=b'x' * part['size'])
+        assert response.status_code == 200
+        parts.append({'part_number': part['part_number'], 'etag': response.headers['ETag']})
+
+    response = client.post('/multipart-upload/complete', json={
+        'key': upload['key'], 'upload_id': upload['upload_id'], 'parts': parts
+    })
+    assert response.status_code == 200
+    assert s3.head_object(Bucket=AWS_BUCKET_NAME, Key=upload['key'])['ContentLength'] == size
+
+
+def test_aborted_multipart_upload_is_discarded(s3, client):
+    upload = request_upload(client, '/multipart-upload', 9 * MB).get_json()
+
+    response = client.post('/multipart-upload/abort', json={'key': upload['key'], 'upload_id': upload['upload_id']})
+
+    assert response.status_code == 200
+    assert s3.list_multipart_uploads(Bucket=AWS_BUCKET_NAME).get('Uploads', []) == []
+
+
+@pytest.mark.parametrize('path', ['/upload-url', '/multipart-upload'])
+@pytest.mark.parametrize('content_type', ['text/html', 'image/svg+xml', None])
+def test_disallowed_content_types_are_rejected(s3, client, path, content_type):
+    response = request_upload(client, path, 10, content_type=content_type)
+
+    assert response.status_code == 400
+    assert 'content_type' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('path', ['/upload-url', '/multipart-upload'])
+@pytest.mark.parametrize('size, status_code', [
+    (app_module.MAX_UPLOAD_SIZE_MB * MB + 1, 413),
+    (0, 400),
+    ('ten', 400),
+])
+def test_missing_or_oversized_sizes_are_rejected(s3, client, path, size, status_code):
+    response = request_upload(client, path, size)
+
+    assert response.status_code == status_code
+    assert s3.list_multipart_uploads(Bucket=AWS_BUCKET_NAME).get('Uploads', []) == []